@@ -0,0 +1,100 @@
+import re
+import threading
+
+# --------------------------- Intent Classifier ---------------------------
+# Checked in order, first match wins; plain substring patterns like the original keyword checks
+INTENT_PATTERNS = [
+    ("stock", re.compile("available|stock")),
+    ("dosage", re.compile("dosage|take|how")),
+    ("alternative", re.compile("alternative|substitute")),
+]
+INTENTS = [intent for intent, _ in INTENT_PATTERNS] + ["summary"]
+
+def classify_intent(query_lower):
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(query_lower):
+            return intent
+    return "summary"
+
+# --------------------------- Formatting ---------------------------
+def format_response_pointwise(text):
+    points = text.split('. ')
+    formatted = ""
+    for point in points:
+        if point.strip():
+            formatted += f"• {point.strip()}\n"
+    return formatted
+
+def compose_answers(row, quantity, branch):
+    stock_msg = "available" if quantity > 0 else "out of stock"
+    alternative = row['Alternative'] if stock_msg != "available" else None
+    dosage = row['Dosage_Instruction']
+    return {
+        "stock": f"{row['Medicine_Name']} is {stock_msg} at the {branch} branch ({quantity} units)." + (f" Alternative: {alternative}." if alternative else ""),
+        "dosage": f"Dosage for {row['Medicine_Name']}: {dosage}.",
+        "alternative": f"Alternative for {row['Medicine_Name']}: {alternative if alternative else 'No alternative needed, medicine is available.'}",
+        "summary": (
+            f"{row['Medicine_Name']} {row['Strength']} is used for {row['Use_Case']}. "
+            f"Stock: {stock_msg}. " +
+            (f"Alternative: {alternative}. " if alternative else "") +
+            f"Dosage: {dosage}. Please consult a doctor before use."
+        ),
+    }
+
+# --------------------------- Answer Table ---------------------------
+class AnswerTable:
+    """Fully formatted catalog answers per (medicine, intent), one table per branch.
+
+    A branch's table is built the first time it is queried and, when its stock
+    shard version changes, only rows whose quantity changed are re-rendered.
+    """
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self.rows = {}   # key: medicine_id, value: formulary row as a dict
+        self.terms = []  # (medicine_id, lowercased name and use case words) in catalog order
+        for _, row in inventory.formulary.iterrows():
+            medicine_id = int(row['Medicine_ID'])
+            self.rows[medicine_id] = row.to_dict()
+            use_case_words = [w.strip() for w in row['Use_Case'].lower().split(',')]
+            self.terms.append((medicine_id, (row['Medicine_Name'].lower(), *use_case_words)))
+        self._tables = {}      # key: branch, value: {medicine_id: {intent: answer}}
+        self._quantities = {}  # key: branch, value: quantities the table was rendered with
+        self._versions = {}    # key: branch, value: inventory version the table matches
+        self._lock = threading.Lock()
+
+    def table(self, branch):
+        version = self.inventory.version(branch)
+        if self._versions.get(branch) != version:
+            with self._lock:
+                if self._versions.get(branch) != version:
+                    self._refresh(branch, version)
+        return self._tables[branch]
+
+    def _refresh(self, branch, version):
+        shard = self.inventory.shard(branch)
+        table = self._tables.get(branch, {})
+        rendered = self._quantities.get(branch, {})
+        quantities = {}
+        for medicine_id, row in self.rows.items():
+            quantity = shard.get(medicine_id, 0)
+            quantities[medicine_id] = quantity
+            if medicine_id not in table or rendered.get(medicine_id) != quantity:
+                answers = compose_answers(row, quantity, branch)
+                table[medicine_id] = {intent: format_response_pointwise(text) for intent, text in answers.items()}
+        self._tables[branch] = table
+        self._quantities[branch] = quantities
+        self._versions[branch] = version
+
+    def match(self, query_lower):
+        for medicine_id, terms in self.terms:
+            if any(term in query_lower for term in terms):
+                return medicine_id
+        return None
+
+    def lookup(self, query, branch):
+        query_lower = query.lower()
+        medicine_id = self.match(query_lower)
+        if medicine_id is None:
+            return None
+        return self.table(branch)[medicine_id][classify_intent(query_lower)]
@@ -1,21 +1,29 @@
 import streamlit as st
-import pandas as pd
 import os
+import uuid
 import hashlib
 from langchain.chains import RetrievalQA
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_community.llms import Ollama
+from inventory import Inventory, DEFAULT_BRANCH, list_branches, formulary_documents
+from retrieval import BranchRetriever
+from answers import AnswerTable, format_response_pointwise
+from vector_index import load_matrix_index
+from llm_cache import load_llm_cache
+from audit import AuditLog
 
 # ---------------------------
 # User Authentication
 # ---------------------------
 USER_FILE = "users.txt"
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")  # "chroma" or "matrix"
+VECTOR_DTYPE = os.environ.get("VECTOR_DTYPE", "float32")    # "float32" or "float16", matrix backend only
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def signup_user(username, password):
+def signup_user(username, password, branch=DEFAULT_BRANCH):
     if not os.path.exists(USER_FILE):
         with open(USER_FILE, "w") as f:
             pass
@@ -24,7 +32,7 @@ def signup_user(username, password):
     if username in users:
         return False, "Username already exists."
     with open(USER_FILE, "a") as f:
-        f.write(f"{username},{hash_password(password)}\n")
+        f.write(f"{username},{hash_password(password)},{branch}\n")
     return True, "Signup successful! Please login."
 
 def login_user(username, password):
@@ -33,11 +41,64 @@ def login_user(username, password):
     hashed = hash_password(password)
     with open(USER_FILE, "r") as f:
         for line in f.readlines():
-            user, pwd = line.strip().split(",")
+            user, pwd = line.strip().split(",")[:2]
             if user == username and pwd == hashed:
                 return True
     return False
 
+def get_user_branch(username):
+    # Accounts created before branches existed have no third field and belong to the default branch
+    if not os.path.exists(USER_FILE):
+        return DEFAULT_BRANCH
+    with open(USER_FILE, "r") as f:
+        for line in f.readlines():
+            parts = line.strip().split(",")
+            if parts[0] == username:
+                return parts[2] if len(parts) > 2 and parts[2] else DEFAULT_BRANCH
+    return DEFAULT_BRANCH
+
+@st.cache_resource
+def load_inventory():
+    return Inventory()
+
+@st.cache_resource
+def load_answers():
+    return AnswerTable(load_inventory())
+
+@st.cache_resource
+def load_vectorstore():
+    documents, metadatas = formulary_documents(load_inventory().formulary)
+    embeddings = HuggingFaceEmbeddings(
+        model_name="all-MiniLM-L6-v2",
+        model_kwargs={"device": "cpu"}
+    )
+    VECTORSTORE_DIR = "vectorstore/"
+    if VECTOR_BACKEND == "matrix":
+        return load_matrix_index(documents, metadatas, embeddings, dtype=VECTOR_DTYPE)
+    if not os.path.exists(VECTORSTORE_DIR):
+        vectorstore = Chroma.from_texts(documents, embeddings, metadatas=metadatas, persist_directory=VECTORSTORE_DIR)
+        vectorstore.persist()
+        return vectorstore
+    return Chroma(persist_directory=VECTORSTORE_DIR, embedding_function=embeddings)
+
+@st.cache_resource
+def load_audit_log():
+    return AuditLog()
+
+@st.cache_resource
+def load_response_cache():
+    return load_llm_cache()
+
+@st.cache_resource
+def load_qa(branch):
+    llm = Ollama(model="gemma:2b", cache=load_response_cache())
+    retriever = BranchRetriever(
+        base=load_vectorstore().as_retriever(search_kwargs={"k": 3}),
+        inventory=load_inventory(),
+        branch=branch
+    )
+    return RetrievalQA.from_chain_type(llm=llm, chain_type="stuff", retriever=retriever, return_source_documents=True)
+
 # ---------------------------
 # Initialize session_state
 # ---------------------------
@@ -50,9 +111,15 @@ if "logged_in" not in st.session_state:
 if "current_user" not in st.session_state:
     st.session_state.current_user = None
 
+if "current_branch" not in st.session_state:
+    st.session_state.current_branch = None
+
 if "messages" not in st.session_state:
     st.session_state.messages = {}  # key: username, value: list of chat messages
 
+if "pending_queries" not in st.session_state:
+    st.session_state.pending_queries = []  # submissions not yet answered: {"id", "user", "query"}
+
 # ---------------------------
 # Page Navigation
 # ---------------------------
@@ -65,6 +132,7 @@ def show_login():
         if login_user(username, password):
             st.session_state.logged_in = True
             st.session_state.current_user = username
+            st.session_state.current_branch = get_user_branch(username)
             if username not in st.session_state.messages:
                 st.session_state.messages[username] = []
             st.session_state.page = "app"
@@ -81,9 +149,10 @@ def show_signup():
     st.title("📝 Signup")
     username = st.text_input("Choose Username")
     password = st.text_input("Choose Password", type="password")
+    branch = st.selectbox("Branch", list_branches())
 
     if st.button("Signup"):
-        success, msg = signup_user(username, password)
+        success, msg = signup_user(username, password, branch)
         if success:
             st.success(msg)
             st.session_state.page = "login"
@@ -138,93 +207,86 @@ def navbar():
         st.markdown("<div class='navbar'><span class='navbar-title'>💊 AI Prescription Guidance</span></div>", unsafe_allow_html=True)
     with col2:
         if st.button("🚪 Logout"):
+            load_audit_log().flush()
             st.session_state.logged_in = False
             st.session_state.current_user = None
+            st.session_state.current_branch = None
             st.session_state.page = "login"
             st.session_state.messages = {}  # optional: clear all chats
+            st.session_state.pending_queries = []
             st.stop()
 
+# ---------------------------
+# Query Submission
+# ---------------------------
+def queue_query():
+    # Runs once per click of Send, so a rerun can never submit the same query twice
+    query = st.session_state.query_input.strip()
+    if query:
+        st.session_state.pending_queries.append(
+            {"id": uuid.uuid4().hex, "user": st.session_state.current_user, "query": query}
+        )
+
+def answer_query(query, answers, branch, qa):
+    # Returns (response_text, source, source_documents) so the answer can be audited
+    # Catalog hits come back already formatted from the precomputed answer table
+    med_response = answers.lookup(query, branch)
+    if med_response:
+        return med_response, "catalog", []
+    try:
+        response = qa.invoke(query)
+        rag_response = response.get('result', 'No RAG response available.')
+        source, documents = "rag", response.get('source_documents', [])
+    except Exception as e:
+        rag_response = f"Error generating RAG response: {str(e)}"
+        source, documents = "error", []
+    return format_response_pointwise(rag_response), source, documents
+
+@st.fragment
+def chat_area(answers, qa, branch):
+    # Interactions in here rerun only this fragment, not the rest of the page
+    with st.form("query_form", clear_on_submit=True):
+        st.text_input("Type your query here...", placeholder="Ask about medicine...", key="query_input")
+        st.form_submit_button("Send", on_click=queue_query)
+
+    # A submission leaves the queue in the same step its answer is stored, with no st.* call
+    # in between. If a rerun interrupts generation it is still queued and answered on the next run.
+    for submission in list(st.session_state.pending_queries):
+        with st.spinner("Generating response..."):
+            response_text, source, documents = answer_query(submission["query"], answers, branch, qa)
+        load_audit_log().record(submission["user"], branch, submission["query"], response_text, source, documents)
+        messages = st.session_state.messages.setdefault(submission["user"], [])
+        messages.append({"from": "user", "text": submission["query"]})
+        messages.append({"from": "bot", "text": response_text})
+        st.session_state.pending_queries.remove(submission)
+
+    # Display chat messages
+    st.markdown('<div class="chat-box scrollable">', unsafe_allow_html=True)
+    for msg in st.session_state.messages.get(st.session_state.current_user, []):
+        cls = "user-msg" if msg["from"] == "user" else "bot-msg"
+        st.markdown(f"<div class='{cls}'>{msg['text'].replace(chr(10), '<br>')}</div>", unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
 # ---------------------------
 # AI Prescription Guidance App
 # ---------------------------
 def show_app():
     navbar() 
+    branch = st.session_state.current_branch
     st.title(f"💊 AI Prescription Guidance - {st.session_state.current_user}")
+    st.write(f"Branch: {branch}")
     st.write("Ask about medicine availability, alternatives, dosage, or use cases.")
 
     # -----------------------
-    # Load Medicine CSV
-    # -----------------------
-    df = pd.read_csv("medicines.csv")
-
-    # -----------------------
-    # Prepare Documents for Vector Store
-    # -----------------------
-    documents = [
-        f"{row['Medicine_Name']} {row['Strength']} is used for {row['Use_Case']}. "
-        f"Alternative: {row['Alternative']}. Stock: {row['Stock']}. Dosage: {row['Dosage_Instruction']}"
-        for _, row in df.iterrows()
-    ]
-
-    # -----------------------
-    # Initialize embeddings & vectorstore
+    # Load Formulary and Branch Stock
     # -----------------------
-    embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"}
-    )
-    VECTORSTORE_DIR = "vectorstore/"
-    if not os.path.exists(VECTORSTORE_DIR):
-        vectorstore = Chroma.from_texts(documents, embeddings, persist_directory=VECTORSTORE_DIR)
-        vectorstore.persist()
-    else:
-        vectorstore = Chroma(persist_directory=VECTORSTORE_DIR, embedding_function=embeddings)
+    inventory = load_inventory()
+    answers = load_answers()
 
     # -----------------------
-    # Initialize LLM and RAG Agent
+    # Initialize embeddings, vectorstore and RAG Agent (cached across reruns)
     # -----------------------
-    llm = Ollama(model="gemma:2b")
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-    qa = RetrievalQA.from_chain_type(llm=llm, chain_type="stuff", retriever=retriever, return_source_documents=True)
-
-    # -----------------------
-    # Medicine lookup
-    # -----------------------
-    def get_med_info(query, df):
-        query_lower = query.lower()
-        for _, row in df.iterrows():
-            medicine_name = row['Medicine_Name'].lower()
-            use_case_words = [w.strip() for w in row['Use_Case'].lower().split(',')]
-            if medicine_name in query_lower or any(word in query_lower for word in use_case_words):
-                stock_value = row['Stock'].strip().lower()
-                stock_msg = "available" if stock_value in ["yes", "available", "in stock"] else "out of stock"
-                alternative = row['Alternative'] if stock_msg != "available" else None
-                dosage = row['Dosage_Instruction']
-                if "available" in query_lower or "stock" in query_lower:
-                    return f"{row['Medicine_Name']} is {stock_msg}." + (f" Alternative: {alternative}." if alternative else "")
-                elif "dosage" in query_lower or "take" in query_lower or "how" in query_lower:
-                    return f"Dosage for {row['Medicine_Name']}: {dosage}."
-                elif "alternative" in query_lower or "substitute" in query_lower:
-                    return f"Alternative for {row['Medicine_Name']}: {alternative if alternative else 'No alternative needed, medicine is available.'}"
-                else:
-                    return (
-                        f"{row['Medicine_Name']} {row['Strength']} is used for {row['Use_Case']}. "
-                        f"Stock: {stock_msg}. " +
-                        (f"Alternative: {alternative}. " if alternative else "") +
-                        f"Dosage: {dosage}. Please consult a doctor before use."
-                    )
-        return None
-
-    # -----------------------
-    # Format response
-    # -----------------------
-    def format_response_pointwise(text):
-        points = text.split('. ')
-        formatted = ""
-        for point in points:
-            if point.strip():
-                formatted += f"• {point.strip()}\n"
-        return formatted
+    qa = load_qa(branch)
 
     # -----------------------
     # UI
@@ -267,29 +329,17 @@ def show_app():
         """, unsafe_allow_html=True
     )
 
-    query = st.text_input("Type your query here...", placeholder="Ask about medicine...")
+    chat_area(answers, qa, branch)
 
-    if query:
-        st.session_state.messages[st.session_state.current_user].append({"from": "user", "text": query})
-        with st.spinner("Generating response..."):
-            med_response = get_med_info(query, df)
-            if med_response:
-                response_text = format_response_pointwise(med_response)
-            else:
-                try:
-                    response = qa.invoke(query)
-                    rag_response = response.get('result', 'No RAG response available.')
-                except Exception as e:
-                    rag_response = f"Error generating RAG response: {str(e)}"
-                response_text = format_response_pointwise(rag_response)
-            st.session_state.messages[st.session_state.current_user].append({"from": "bot", "text": response_text})
-
-    # Display chat messages
-    st.markdown('<div class="chat-box scrollable">', unsafe_allow_html=True)
-    for msg in st.session_state.messages.get(st.session_state.current_user, []):
-        cls = "user-msg" if msg["from"] == "user" else "bot-msg"
-        st.markdown(f"<div class='{cls}'>{msg['text'].replace(chr(10), '<br>')}</div>", unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    # Stock updates only rewrite this branch's shard
+    with st.expander(f"📦 Update stock ({branch})"):
+        names = inventory.formulary['Medicine_Name'].tolist()
+        selected = st.selectbox("Medicine", names)
+        medicine_id = inventory.formulary.loc[inventory.formulary['Medicine_Name'] == selected, 'Medicine_ID'].iloc[0]
+        new_quantity = st.number_input("Quantity", min_value=0, step=1, value=inventory.quantity(branch, medicine_id))
+        if st.button("Save stock"):
+            inventory.update_stock(branch, medicine_id, int(new_quantity))
+            st.success(f"{selected} stock at {branch} set to {int(new_quantity)}.")
 
 # ---------------------------
 # Show page based on session_state
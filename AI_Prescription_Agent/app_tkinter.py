@@ -1,23 +1,29 @@
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
-import pandas as pd
 import os
 import hashlib
 from langchain.chains import RetrievalQA
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_community.llms import Ollama
+from inventory import Inventory, DEFAULT_BRANCH, list_branches, formulary_documents
+from retrieval import BranchRetriever
+from answers import AnswerTable, format_response_pointwise
+from vector_index import load_matrix_index
+from llm_cache import load_llm_cache
+from audit import AuditLog
 
 # --------------------------- Constants ---------------------------
 USER_FILE = "users.txt"
-MEDICINES_CSV = "medicines.csv"
 VECTORSTORE_DIR = "vectorstore/"
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")  # "chroma" or "matrix"
+VECTOR_DTYPE = os.environ.get("VECTOR_DTYPE", "float32")    # "float32" or "float16", matrix backend only
 
 # --------------------------- User Authentication Functions ---------------------------
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def signup_user(username, password):
+def signup_user(username, password, branch=DEFAULT_BRANCH):
     if not os.path.exists(USER_FILE):
         with open(USER_FILE, "w") as f:
             pass
@@ -26,7 +32,7 @@ def signup_user(username, password):
     if username in users:
         return False, "Username already exists."
     with open(USER_FILE, "a") as f:
-        f.write(f"{username},{hash_password(password)}\n")
+        f.write(f"{username},{hash_password(password)},{branch}\n")
     return True, "Signup successful! Please login."
 
 def login_user(username, password):
@@ -35,44 +41,21 @@ def login_user(username, password):
     hashed = hash_password(password)
     with open(USER_FILE, "r") as f:
         for line in f.readlines():
-            user, pwd = line.strip().split(",")
+            user, pwd = line.strip().split(",")[:2]
             if user == username and pwd == hashed:
                 return True
     return False
 
-# --------------------------- Medicine and AI Functions ---------------------------
-def get_med_info(query, df):
-    query_lower = query.lower()
-    for _, row in df.iterrows():
-        medicine_name = row['Medicine_Name'].lower()
-        use_case_words = [w.strip() for w in row['Use_Case'].lower().split(',')]
-        if medicine_name in query_lower or any(word in query_lower for word in use_case_words):
-            stock_value = row['Stock'].strip().lower()
-            stock_msg = "available" if stock_value in ["yes", "available", "in stock"] else "out of stock"
-            alternative = row['Alternative'] if stock_msg != "available" else None
-            dosage = row['Dosage_Instruction']
-            if "available" in query_lower or "stock" in query_lower:
-                return f"{row['Medicine_Name']} is {stock_msg}." + (f" Alternative: {alternative}." if alternative else "")
-            elif "dosage" in query_lower or "take" in query_lower or "how" in query_lower:
-                return f"Dosage for {row['Medicine_Name']}: {dosage}."
-            elif "alternative" in query_lower or "substitute" in query_lower:
-                return f"Alternative for {row['Medicine_Name']}: {alternative if alternative else 'No alternative needed, medicine is available.'}"
-            else:
-                return (
-                    f"{row['Medicine_Name']} {row['Strength']} is used for {row['Use_Case']}. "
-                    f"Stock: {stock_msg}. " +
-                    (f"Alternative: {alternative}. " if alternative else "") +
-                    f"Dosage: {dosage}. Please consult a doctor before use."
-                )
-    return None
-
-def format_response_pointwise(text):
-    points = text.split('. ')
-    formatted = ""
-    for point in points:
-        if point.strip():
-            formatted += f"• {point.strip()}\n"
-    return formatted
+def get_user_branch(username):
+    # Accounts created before branches existed have no third field and belong to the default branch
+    if not os.path.exists(USER_FILE):
+        return DEFAULT_BRANCH
+    with open(USER_FILE, "r") as f:
+        for line in f.readlines():
+            parts = line.strip().split(",")
+            if parts[0] == username:
+                return parts[2] if len(parts) > 2 and parts[2] else DEFAULT_BRANCH
+    return DEFAULT_BRANCH
 
 # --------------------------- Tkinter App Class ---------------------------
 class TkinterApp(tk.Tk):
@@ -91,11 +74,16 @@ class TkinterApp(tk.Tk):
         # Session state
         self.logged_in = False
         self.current_user = None
+        self.current_branch = None
         self.messages = {}
 
-        # Load medicine data
+        # Load formulary; branch stock shards are loaded on first use
         print("Loading medicine data")
-        self.df = pd.read_csv(MEDICINES_CSV)
+        self.inventory = Inventory()
+        self.answers = AnswerTable(self.inventory)
+
+        # Queries and answers are audited by a background writer, off the UI thread
+        self.audit = AuditLog()
 
         # Initialize AI components later to reduce loading time
         self.embeddings = None
@@ -161,23 +149,27 @@ class TkinterApp(tk.Tk):
                 model_name="all-MiniLM-L6-v2",
                 model_kwargs={"device": "cpu"}
             )
-            if not os.path.exists(VECTORSTORE_DIR):
-                documents = [
-                    f"{row['Medicine_Name']} {row['Strength']} is used for {row['Use_Case']}. "
-                    f"Alternative: {row['Alternative']}. Stock: {row['Stock']}. Dosage: {row['Dosage_Instruction']}"
-                    for _, row in self.df.iterrows()
-                ]
-                self.vectorstore = Chroma.from_texts(documents, self.embeddings, persist_directory=VECTORSTORE_DIR)
+            documents, metadatas = formulary_documents(self.inventory.formulary)
+            if VECTOR_BACKEND == "matrix":
+                self.vectorstore = load_matrix_index(documents, metadatas, self.embeddings, dtype=VECTOR_DTYPE)
+            elif not os.path.exists(VECTORSTORE_DIR):
+                self.vectorstore = Chroma.from_texts(documents, self.embeddings, metadatas=metadatas,
+                                                     persist_directory=VECTORSTORE_DIR)
                 self.vectorstore.persist()
             else:
                 self.vectorstore = Chroma(persist_directory=VECTORSTORE_DIR, embedding_function=self.embeddings)
 
-            self.llm = Ollama(model="gemma:2b")
-            self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 3})
+            self.llm = Ollama(model="gemma:2b", cache=load_llm_cache())
+            self.retriever = BranchRetriever(base=self.vectorstore.as_retriever(search_kwargs={"k": 3}),
+                                             inventory=self.inventory, branch=self.current_branch)
             self.qa = RetrievalQA.from_chain_type(llm=self.llm, chain_type="stuff",
                                                   retriever=self.retriever, return_source_documents=True)
             """
 
+        # The QA chain is shared across logins; point its stock lookups at this user's branch
+        if self.qa is not None:
+            self.retriever.branch = self.current_branch
+
         # Destroy loading popup
         if self.loading_popup and self.loading_popup.winfo_exists():
             self.loading_popup.destroy()
@@ -231,6 +223,7 @@ class LoginPopup(tk.Toplevel):
         if login_user(username, password):
             self.master.logged_in = True
             self.master.current_user = username
+            self.master.current_branch = get_user_branch(username)
             if username not in self.master.messages:
                 self.master.messages[username] = []
             self.master.close_login_popup()
@@ -269,15 +262,15 @@ class SignupPopup(tk.Toplevel):
         self.master = master
         self.title("Signup")
         self.configure(bg="white")
-        self.geometry("400x350")
+        self.geometry("400x400")
         self.resizable(False, False)
         self.transient(master)  # Make it modal
         self.grab_set()  # Grab focus
         # Center the window
         self.update_idletasks()
         x = (self.winfo_screenwidth() // 2) - (400 // 2)
-        y = (self.winfo_screenheight() // 2) - (350 // 2)
-        self.geometry(f"400x350+{x}+{y}")
+        y = (self.winfo_screenheight() // 2) - (400 // 2)
+        self.geometry(f"400x400+{x}+{y}")
 
         tk.Label(self, text="📝 Signup", font=("Arial", 24, "bold"), bg="white").pack(pady=20)
         tk.Label(self, text="Choose Username:", bg="white").pack()
@@ -286,6 +279,10 @@ class SignupPopup(tk.Toplevel):
         tk.Label(self, text="Choose Password:", bg="white").pack()
         self.password_entry = tk.Entry(self, show="*", bg="yellow")
         self.password_entry.pack()
+        tk.Label(self, text="Branch:", bg="white").pack()
+        branches = list_branches()
+        self.branch_var = tk.StringVar(self, value=branches[0])
+        tk.OptionMenu(self, self.branch_var, *branches).pack()
         tk.Button(self, text="Signup", command=self.signup,
                   bg="#4CAF50", fg="white", activebackground="#45a049").pack(pady=10)
         tk.Label(self, text="Already have an account?", bg="white").pack()
@@ -295,7 +292,7 @@ class SignupPopup(tk.Toplevel):
     def signup(self):
         username = self.username_entry.get()
         password = self.password_entry.get()
-        success, msg = signup_user(username, password)
+        success, msg = signup_user(username, password, self.branch_var.get())
         if success:
             messagebox.showinfo("Success", msg)
             self.master.close_signup_popup()
@@ -348,11 +345,13 @@ class MainAppFrame(tk.Frame):
 
     def update_title(self):
         if self.master.current_user:
-            self.title_label.config(text=f"💊 AI Prescription Guidance - {self.master.current_user}")
+            self.title_label.config(text=f"💊 AI Prescription Guidance - {self.master.current_user} ({self.master.current_branch})")
 
     def logout(self):
+        self.master.audit.flush()
         self.master.logged_in = False
         self.master.current_user = None
+        self.master.current_branch = None
         self.master.messages = {}
         self.chat_display.delete(1.0, tk.END)
         # Hide main frame
@@ -370,16 +369,21 @@ class MainAppFrame(tk.Frame):
         self.display_message("user", query)
 
         # Generate response
-        med_response = get_med_info(query, self.master.df)
+        med_response = self.master.answers.lookup(query, self.master.current_branch)
         if med_response:
-            response_text = format_response_pointwise(med_response)
+            response_text = med_response
+            source, documents = "catalog", []
         else:
             try:
                 response = self.master.qa.invoke(query)
                 rag_response = response.get('result', 'No RAG response available.')
+                source, documents = "rag", response.get('source_documents', [])
             except Exception as e:
                 rag_response = f"Error generating RAG response: {str(e)}"
+                source, documents = "error", []
             response_text = format_response_pointwise(rag_response)
+        self.master.audit.record(self.master.current_user, self.master.current_branch, query,
+                                 response_text, source, documents)
 
         # Add bot message
         self.master.messages[self.master.current_user].append({"from": "bot", "text": response_text})
@@ -394,3 +398,4 @@ class MainAppFrame(tk.Frame):
 if __name__ == "__main__":
     app = TkinterApp()
     app.mainloop()
+    app.audit.close()
@@ -16,7 +16,8 @@ def collect_all_files(directory):
 
 datas = [
     ('users.txt', '.'),
-    ('medicines.csv', '.'),
+    ('formulary.csv', '.'),
+    ('stock', 'stock'),
 ]
 
 # Manually collect all files from vectorstore directory recursively
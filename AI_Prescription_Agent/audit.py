@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import math
+import time
+import queue
+import atexit
+import argparse
+import threading
+from datetime import datetime
+
+# --------------------------- Constants ---------------------------
+AUDIT_DIR = os.environ.get("AUDIT_DIR", "audit/")
+AUDIT_QUEUE_SIZE = 10000         # records held in memory before record() blocks the caller
+AUDIT_BATCH_SIZE = 500           # records written per batch
+AUDIT_FLUSH_INTERVAL = 1.0       # seconds a partial batch waits before it is written
+AUDIT_MAX_BYTES = 8 * 1024 * 1024  # size at which the current log file is rotated
+
+_FLUSH = object()  # queued as (_FLUSH, threading.Event) by flush()
+_STOP = object()
+
+def is_marker(entry):
+    return entry is _STOP or (isinstance(entry, tuple) and entry[0] is _FLUSH)
+
+# --------------------------- Log File Names ---------------------------
+# Open file:    audit-<first_ts_ms>-<pid>.jsonl
+# Rotated file: audit-<min_ts_ms>-<max_ts_ms>-<pid>.jsonl
+# Spans come from the records' own timestamps, not from when the writer opened or closed
+# the file. Every process writes its own files, so lines from different writers never interleave.
+def log_file_span(name):
+    if not (name.startswith("audit-") and name.endswith(".jsonl")):
+        return None
+    parts = name[len("audit-"):-len(".jsonl")].split("-")
+    if len(parts) == 2:
+        return int(parts[0]) / 1000, None
+    if len(parts) == 3:
+        return int(parts[0]) / 1000, int(parts[1]) / 1000
+    return None
+
+# --------------------------- Audit Log Writer ---------------------------
+class AuditLog:
+    """Write-behind audit trail of every query and the answer it received.
+
+    record() only puts the record on a bounded in-memory queue; a background
+    thread writes queued records in batches as JSON lines and rotates the file
+    once it reaches max_bytes. When the queue is full record() blocks, so a slow
+    disk slows callers down rather than dropping records. flush() returns once
+    everything queued so far is on disk, and close() runs at interpreter exit.
+    """
+
+    def __init__(self, log_dir=AUDIT_DIR, queue_size=AUDIT_QUEUE_SIZE, batch_size=AUDIT_BATCH_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL, max_bytes=AUDIT_MAX_BYTES):
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._path = None
+        self._min_ts = None
+        self._max_ts = None
+        self._size = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, user, branch, query, answer, source, documents=None):
+        if self._closed:
+            raise RuntimeError("Audit log is closed.")
+        entry = {"ts": round(time.time(), 3), "u": user, "b": branch, "q": query, "a": answer, "src": source}
+        if documents:
+            entry["docs"] = [doc.metadata.get("Medicine_ID", doc.page_content) for doc in documents]
+        self.queue.put(entry)
+
+    def flush(self):
+        # Waits only for records queued before this call, not for other sessions still recording
+        if self._closed:
+            return
+        done = threading.Event()
+        self.queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(_STOP)
+        self._writer.join()
+
+    # ---- background writer ----
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while not is_marker(item) and len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            stop = any(entry is _STOP for entry in batch)
+            records = [entry for entry in batch if not is_marker(entry)]
+            # Any failure is reported and the batch still marked done: a dead writer thread would
+            # leave flush() waiting forever and record() blocked once the queue fills
+            try:
+                if records:
+                    self._write(records)
+                if stop:
+                    self._close_file()
+            except Exception as e:
+                print(f"Audit log write failed, {len(records)} records lost: {e!r}", file=sys.stderr)
+            finally:
+                for entry in batch:
+                    if isinstance(entry, tuple):
+                        entry[1].set()
+                    self.queue.task_done()
+
+    def _write(self, records):
+        # Records are serialized one by one so a bad value can only ever cost its own record
+        lines = []
+        for r in records:
+            try:
+                lines.append(json.dumps(r, separators=(",", ":"), ensure_ascii=False, default=str) + "\n")
+            except (TypeError, ValueError) as e:
+                print(f"Audit record for {r.get('u')!r} at {r.get('ts')} could not be serialized: {e!r}",
+                      file=sys.stderr)
+        if not lines:
+            return
+        data = "".join(lines).encode()
+        if self._file is not None and self._size + len(data) > self.max_bytes:
+            self._close_file()
+        batch_min = min(r["ts"] for r in records)
+        batch_max = max(r["ts"] for r in records)
+        if self._file is None:
+            self._open_file(batch_min)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._size += len(data)
+        self._min_ts = min(self._min_ts, batch_min)
+        self._max_ts = max(self._max_ts, batch_max)
+
+    def _open_file(self, first_ts):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._path = os.path.join(self.log_dir, f"audit-{math.floor(first_ts * 1000)}-{os.getpid()}.jsonl")
+        self._file = open(self._path, "ab")
+        self._size = 0
+        self._min_ts = self._max_ts = first_ts
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._file.close()
+        start, end = math.floor(self._min_ts * 1000), math.ceil(self._max_ts * 1000)
+        # Widening the span by a millisecond keeps two files with identical spans from colliding
+        while os.path.exists(os.path.join(self.log_dir, f"audit-{start}-{end}-{os.getpid()}.jsonl")):
+            end += 1
+        os.replace(self._path, os.path.join(self.log_dir, f"audit-{start}-{end}-{os.getpid()}.jsonl"))
+        self._file = None
+
+# --------------------------- Audit Log Query ---------------------------
+def query_audit_log(log_dir=AUDIT_DIR, user=None, since=None, until=None):
+    """Yield audit records for user between since and until (epoch seconds), oldest file first."""
+    if not os.path.exists(log_dir):
+        return
+    files = []
+    for name in os.listdir(log_dir):
+        span = log_file_span(name)
+        if span is None:
+            continue
+        start, end = span
+        # Rotated files carry the exact span of their records, so files outside the range are
+        # never opened. An open file is always scanned: a record queued by another thread can
+        # carry a timestamp slightly older than the batch that named the file.
+        if end is not None and ((until is not None and start > until) or (since is not None and end < since)):
+            continue
+        files.append((start, name))
+
+    # Cheap substring check on the raw line before paying for JSON parsing
+    needle = f'"u":{json.dumps(user, ensure_ascii=False)},' if user is not None else None
+    for _, name in sorted(files):
+        with open(os.path.join(log_dir, name), "r", encoding="utf-8") as f:
+            for line in f:
+                if needle is not None and needle not in line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:  # partial last line of a file still being written
+                    continue
+                if user is not None and entry["u"] != user:
+                    continue
+                if since is not None and entry["ts"] < since:
+                    continue
+                if until is not None and entry["ts"] > until:
+                    continue
+                yield entry
+
+def parse_time(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the dispensing audit log.")
+    parser.add_argument("--dir", default=AUDIT_DIR)
+    parser.add_argument("--user")
+    parser.add_argument("--since", help="ISO date or datetime, e.g. 2025-01-31 or 2025-01-31T09:00")
+    parser.add_argument("--until", help="ISO date or datetime")
+    args = parser.parse_args()
+
+    for entry in query_audit_log(args.dir, args.user, parse_time(args.since), parse_time(args.until)):
+        stamp = datetime.fromtimestamp(entry["ts"]).isoformat(timespec="seconds")
+        print(json.dumps({"time": stamp, **entry}, ensure_ascii=False))
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.vectorstores import Chroma
+from inventory import Inventory, formulary_documents
+import vector_index
+from vector_index import MatrixIndex, build_matrix_index, build_ann, current_build, ANN_FILE, VECTORS_FILE, DOCS_FILE
+
+# Run from the repository root, like the apps:
+#   python AI_Prescription_Agent/benchmark_vector_index.py --synthetic 10000 100000
+
+QUERIES = [
+    "medicine for fever",
+    "what can I take for diabetes",
+    "alternative for amoxicillin",
+    "dosage of azithromycin",
+    "something for allergy and cold",
+]
+
+# --------------------------- Timing Helpers ---------------------------
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def report(name, open_ms, query_ms):
+    print(f"{name:<28} open {open_ms:9.2f} ms   query {query_ms:8.3f} ms")
+
+# --------------------------- Formulary Benchmark ---------------------------
+def bench_formulary(embeddings, repeat, k):
+    inventory = Inventory()
+    texts, metadatas = formulary_documents(inventory.formulary)
+    workdir = tempfile.mkdtemp()
+    try:
+        chroma_dir = os.path.join(workdir, "chroma")
+        Chroma.from_texts(texts, embeddings, metadatas=metadatas, persist_directory=chroma_dir)
+        for dtype in ["float32", "float16"]:
+            build_matrix_index(texts, metadatas, embeddings, os.path.join(workdir, dtype), dtype)
+
+        # Query vectors are embedded once so only the search itself is timed
+        vectors = [embeddings.embed_query(q) for q in QUERIES]
+
+        open_ms, chroma = timed(lambda: Chroma(persist_directory=chroma_dir, embedding_function=embeddings), 1)
+        query_ms, _ = timed(lambda: [chroma.similarity_search_by_vector(v, k=k) for v in vectors], repeat)
+        report("chroma", open_ms, query_ms / len(vectors))
+
+        for dtype in ["float32", "float16"]:
+            open_ms, index = timed(lambda: MatrixIndex(current_build(os.path.join(workdir, dtype)), embeddings), 1)
+            query_ms, _ = timed(lambda: [index.search_vector(v, k) for v in vectors], repeat)
+            report(f"matrix {dtype}", open_ms, query_ms / len(vectors))
+
+            # The two backends should agree on the top hit for the formulary
+            for query, vector in zip(QUERIES, vectors):
+                chroma_top = chroma.similarity_search_by_vector(vector, k=1)[0].page_content
+                matrix_top = index.texts[index.search_vector(vector, 1)[0][0]]
+                if chroma_top != matrix_top:
+                    print(f"  top hit differs for {query!r}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# --------------------------- Synthetic Benchmark ---------------------------
+def write_synthetic(index_dir, rows, dim, dtype):
+    os.makedirs(index_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((rows, dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.save(os.path.join(index_dir, VECTORS_FILE), matrix.astype(dtype))
+    with open(os.path.join(index_dir, DOCS_FILE), "w") as f:
+        json.dump({"dtype": dtype, "texts": [""] * rows, "metadatas": [{}] * rows}, f)
+    return matrix
+
+def bench_synthetic(sizes, dim, repeat, k):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((len(QUERIES), dim), dtype=np.float32)
+    for rows in sizes:
+        workdir = tempfile.mkdtemp()
+        try:
+            matrix = write_synthetic(workdir, rows, dim, "float32")
+            open_ms, index = timed(lambda: MatrixIndex(workdir, None, ann_threshold=float("inf")), 1)
+            query_ms, _ = timed(lambda: [index.search_vector(v, k) for v in vectors], repeat)
+            report(f"exact {rows} rows", open_ms, query_ms / len(vectors))
+
+            if vector_index.hnswlib is None:
+                continue
+            build_ann(matrix, os.path.join(workdir, ANN_FILE))
+            open_ms, index = timed(lambda: MatrixIndex(workdir, None, ann_threshold=0), 1)
+            query_ms, _ = timed(lambda: [index.search_vector(v, k) for v in vectors], repeat)
+            report(f"ann {rows} rows", open_ms, query_ms / len(vectors))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# --------------------------- Main ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Chroma and memory-mapped matrix vector indexes.")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[],
+                        help="also time exact vs ANN search on random matrices of these row counts")
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={"device": "cpu"})
+    bench_formulary(embeddings, args.repeat, args.k)
+    if args.synthetic:
+        bench_synthetic(args.synthetic, args.dim, args.repeat, args.k)
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --------------------------- Constants ---------------------------
+FORMULARY_CSV = "formulary.csv"
+STOCK_DIR = "stock/"
+DEFAULT_BRANCH = "main"
+
+# --------------------------- Stock Shard Helpers ---------------------------
+def stock_path(branch, stock_dir=STOCK_DIR):
+    return os.path.join(stock_dir, f"{branch}.csv")
+
+def list_branches(stock_dir=STOCK_DIR):
+    if not os.path.exists(stock_dir):
+        return [DEFAULT_BRANCH]
+    branches = sorted(name[:-4] for name in os.listdir(stock_dir) if name.endswith(".csv"))
+    return branches or [DEFAULT_BRANCH]
+
+def read_shard(path):
+    if not os.path.exists(path):
+        return {}
+    shard = pd.read_csv(path)
+    return dict(zip(shard["Medicine_ID"].astype(int), shard["Quantity"].astype(int)))
+
+def write_shard(path, shard):
+    # Write to a uniquely named temp file and swap it in so readers never see a half-written shard
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            pd.DataFrame(sorted(shard.items()), columns=["Medicine_ID", "Quantity"]).to_csv(f, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+@contextmanager
+def file_lock(path):
+    # OS-level lock on <path>.lock so other processes (Streamlit workers, desktop seats) are serialized
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10 seconds; keep waiting
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+# --------------------------- Inventory ---------------------------
+class Inventory:
+    """Shared formulary plus one stock shard per branch.
+
+    Shards are loaded lazily the first time a branch is queried, so the cost of a
+    lookup does not grow with the number of branches. Every shard carries its own
+    version number; it is bumped only when that branch's stock changes, which lets
+    callers key caches per branch without touching the others.
+    """
+
+    def __init__(self, formulary_csv=FORMULARY_CSV, stock_dir=STOCK_DIR):
+        self.formulary = pd.read_csv(formulary_csv)
+        self.stock_dir = stock_dir
+        self._shards = {}    # key: branch, value: {medicine_id: quantity}
+        self._mtimes = {}    # key: branch, value: shard file mtime when last loaded
+        self._versions = {}  # key: branch, value: int bumped on every change
+        self._locks = {}     # key: branch, value: lock guarding that branch's cache entries
+        self._locks_guard = threading.Lock()
+
+    def _branch_lock(self, branch):
+        with self._locks_guard:
+            return self._locks.setdefault(branch, threading.Lock())
+
+    def branches(self):
+        return list_branches(self.stock_dir)
+
+    def shard(self, branch):
+        path = stock_path(branch, self.stock_dir)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        with self._branch_lock(branch):
+            # Reload only when another process (or desktop seat) rewrote this branch's file
+            if branch not in self._shards or self._mtimes.get(branch) != mtime:
+                self._shards[branch] = read_shard(path)
+                self._mtimes[branch] = mtime
+                self._versions[branch] = self._versions.get(branch, 0) + 1
+            return self._shards[branch]
+
+    def version(self, branch):
+        self.shard(branch)
+        return self._versions[branch]
+
+    def quantity(self, branch, medicine_id):
+        return self.shard(branch).get(int(medicine_id), 0)
+
+    def in_stock(self, branch, medicine_id):
+        return self.quantity(branch, medicine_id) > 0
+
+    def update_stock(self, branch, medicine_id, quantity):
+        if quantity < 0:
+            raise ValueError("Quantity cannot be negative.")
+        path = stock_path(branch, self.stock_dir)
+        # The file lock serializes updates from every thread and process; the branch lock is only
+        # held for the cache swap, so readers never wait on another process's write
+        with file_lock(path):
+            shard = read_shard(path)
+            shard[int(medicine_id)] = int(quantity)
+            write_shard(path, shard)
+            mtime = os.path.getmtime(path)
+            with self._branch_lock(branch):
+                self._shards[branch] = shard
+                self._mtimes[branch] = mtime
+                self._versions[branch] = self._versions.get(branch, 0) + 1
+
+    def create_branch(self, branch):
+        path = stock_path(branch, self.stock_dir)
+        with file_lock(path):
+            if os.path.exists(path):
+                return False
+            write_shard(path, {int(med_id): 0 for med_id in self.formulary["Medicine_ID"]})
+        return True
+
+# --------------------------- Vector Store Documents ---------------------------
+def formulary_documents(formulary):
+    # Stock is deliberately left out: it is branch specific and attached at retrieval time
+    texts = [
+        f"{row['Medicine_Name']} {row['Strength']} is used for {row['Use_Case']}. "
+        f"Alternative: {row['Alternative']}. Dosage: {row['Dosage_Instruction']}"
+        for _, row in formulary.iterrows()
+    ]
+    metadatas = [{"Medicine_ID": int(row["Medicine_ID"])} for _, row in formulary.iterrows()]
+    return texts, metadatas
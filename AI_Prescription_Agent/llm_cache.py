@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from langchain_core.caches import BaseCache
+from langchain_core.outputs import Generation
+
+# --------------------------- Constants ---------------------------
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_MODE = os.environ.get("LLM_CACHE_MODE", "record")  # "record", "replay" or "off"
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_TOUCH_INTERVAL = 60.0  # seconds before a hit refreshes an entry's accessed_at again
+MODES = ["record", "replay", "off"]
+
+class CacheMissError(RuntimeError):
+    pass
+
+# --------------------------- Response Cache ---------------------------
+def cache_key(prompt, llm_string):
+    # llm_string is LangChain's sorted dump of the model name and generation parameters
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+class SQLiteResponseCache(BaseCache):
+    """LLM responses kept in SQLite, shared by every process that opens the same file.
+
+    The database runs in WAL mode so Streamlit workers and desktop seats can read
+    while another one writes. Once max_entries is exceeded the least recently used
+    responses are evicted. Recency is only tracked to within touch_interval: a hit
+    writes accessed_at only when the stored value is older than that, so popular
+    prompts do not turn every cached read into a write. In "replay" mode a miss
+    raises CacheMissError instead of reaching the model, which makes the full
+    qa.invoke path deterministic offline.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, mode=LLM_CACHE_MODE, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 touch_interval=LLM_CACHE_TOUCH_INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}, expected one of {MODES}.")
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()  # sqlite3 connections cannot be shared across threads
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, generations TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, prompt, llm_string):
+        key = cache_key(prompt, llm_string)
+        conn = self._connect()
+        row = conn.execute("SELECT generations, accessed_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            if self.mode == "replay":
+                raise CacheMissError(f"No cached response for prompt {key[:12]} in replay mode.")
+            return None
+        now = time.time()
+        if self.mode == "record" and now - row[1] >= self.touch_interval:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return [Generation(**generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt, llm_string, return_val):
+        if self.mode != "record":
+            return
+        generations = json.dumps(
+            [{"text": g.text, "generation_info": g.generation_info} for g in return_val], default=str
+        )
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, generations, accessed_at) VALUES (?, ?, ?)",
+                (cache_key(prompt, llm_string), generations, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self, **kwargs):
+        self._connect().execute("DELETE FROM responses")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+def load_llm_cache(path=LLM_CACHE_PATH, mode=LLM_CACHE_MODE, max_entries=LLM_CACHE_MAX_ENTRIES):
+    # None lets the LLM fall back to LangChain's default, i.e. no caching
+    if mode == "off":
+        return None
+    return SQLiteResponseCache(path, mode, max_entries)
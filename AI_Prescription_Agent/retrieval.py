@@ -0,0 +1,30 @@
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# --------------------------- Branch Scoped Retriever ---------------------------
+class BranchRetriever(BaseRetriever):
+    """Wraps a formulary retriever and attaches the stock of a single branch.
+
+    The vector index only holds the shared formulary, so a stock change in one
+    branch never requires re-embedding or touching the index used by the others.
+    """
+
+    base: BaseRetriever
+    inventory: Any
+    branch: str
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        docs = self.base.invoke(query, config={"callbacks": run_manager.get_child()})
+        return [self._scope(doc) for doc in docs]
+
+    def _scope(self, doc):
+        medicine_id = doc.metadata.get("Medicine_ID")
+        if medicine_id is None:
+            return doc
+        quantity = self.inventory.quantity(self.branch, medicine_id)
+        stock_msg = f"{quantity} units" if quantity > 0 else "out of stock"
+        return Document(
+            page_content=f"{doc.page_content}. Stock at {self.branch} branch: {stock_msg}.",
+            metadata={**doc.metadata, "branch": self.branch, "quantity": quantity},
+        )
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from typing import Any, List
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from inventory import file_lock
+
+try:
+    import hnswlib
+except ImportError:  # ANN is optional; without it every search is exact
+    hnswlib = None
+
+# --------------------------- Constants ---------------------------
+MATRIX_INDEX_DIR = "vectorstore_matrix/"
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.json"
+ANN_FILE = "ann.bin"
+CURRENT_FILE = "CURRENT"
+ANN_THRESHOLD = 50000   # rows above which searches go through the HNSW index
+SCORE_CHUNK = 65536     # rows converted to float32 at a time when the matrix is float16
+
+# --------------------------- Index Files ---------------------------
+def index_fingerprint(texts, metadatas):
+    # Metadata is included so a renumbered Medicine_ID with unchanged text still forces a rebuild
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode())
+        digest.update(b"\0")
+    digest.update(json.dumps(list(metadatas or []), sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def replace_file(path, write):
+    # Write a new file next to the old one and swap it in, never rewriting it in place
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_text(text):
+    def write(path):
+        with open(path, "w") as f:
+            f.write(text)
+    return write
+
+# Every build lives in its own directory named after its fingerprint and dtype, and is only
+# ever renamed into place once complete. A build is never modified afterwards, so a process
+# that has one open (or mmapped) can never see another build's vectors next to its texts.
+# CURRENT names the latest build.
+def build_name(fingerprint, dtype):
+    return f"{fingerprint[:16]}-{dtype}"
+
+def current_build(index_dir=MATRIX_INDEX_DIR):
+    with open(os.path.join(index_dir, CURRENT_FILE), "r") as f:
+        return os.path.join(index_dir, f.read().strip())
+
+def write_build(texts, metadatas, embeddings, index_dir, dtype):
+    name = build_name(index_fingerprint(texts, metadatas), dtype)
+    build_dir = os.path.join(index_dir, name)
+    if not os.path.exists(build_dir):
+        tmp_dir = tempfile.mkdtemp(dir=index_dir, prefix=".build-")
+        try:
+            matrix = normalize(embeddings.embed_documents(list(texts))).astype(dtype)
+            with open(os.path.join(tmp_dir, VECTORS_FILE), "wb") as f:
+                np.save(f, matrix)
+            if hnswlib is not None and len(matrix) > ANN_THRESHOLD:
+                build_ann(matrix, os.path.join(tmp_dir, ANN_FILE))
+            with open(os.path.join(tmp_dir, DOCS_FILE), "w") as f:
+                json.dump({"dtype": dtype, "texts": list(texts),
+                           "metadatas": list(metadatas or [{} for _ in texts])}, f)
+            os.rename(tmp_dir, build_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    # Keep the previous build for processes that still have it open; drop anything older
+    previous = os.path.basename(current_build(index_dir)) if os.path.exists(os.path.join(index_dir, CURRENT_FILE)) else None
+    if previous == name:
+        return build_dir
+    replace_file(os.path.join(index_dir, CURRENT_FILE), write_text(name))
+    for entry in os.listdir(index_dir):
+        path = os.path.join(index_dir, entry)
+        if os.path.isdir(path) and not entry.startswith(".") and entry not in (name, previous):
+            shutil.rmtree(path, ignore_errors=True)
+    return build_dir
+
+def build_matrix_index(texts, metadatas, embeddings, index_dir=MATRIX_INDEX_DIR, dtype="float32"):
+    os.makedirs(index_dir, exist_ok=True)
+    with file_lock(os.path.join(index_dir, "build")):
+        build_dir = write_build(texts, metadatas, embeddings, index_dir, dtype)
+    return MatrixIndex(build_dir, embeddings)
+
+def build_ann(matrix, ann_path):
+    ann = hnswlib.Index(space="ip", dim=matrix.shape[1])
+    ann.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+    ann.add_items(np.asarray(matrix, dtype=np.float32), np.arange(len(matrix)))
+    replace_file(ann_path, ann.save_index)
+    return ann
+
+def load_matrix_index(texts, metadatas, embeddings, index_dir=MATRIX_INDEX_DIR, dtype="float32"):
+    # A build matching the formulary text, metadata and dtype is opened directly; otherwise one
+    # process embeds the catalog under the build lock while the others wait and then reuse it
+    build_dir = os.path.join(index_dir, build_name(index_fingerprint(texts, metadatas), dtype))
+    if os.path.exists(build_dir):
+        return MatrixIndex(build_dir, embeddings)
+    return build_matrix_index(texts, metadatas, embeddings, index_dir, dtype)
+
+# --------------------------- Matrix Index ---------------------------
+class MatrixIndex:
+    """Normalized embeddings in one memory-mapped matrix, searched by inner product.
+
+    Opening the index maps the file instead of reading it, so it is near instant
+    and processes on the same machine share the pages. Small catalogs are searched
+    exactly with a single matrix multiply; above ANN_THRESHOLD rows an HNSW index
+    is used when hnswlib is installed.
+    """
+
+    def __init__(self, build_dir, embeddings, ann_threshold=ANN_THRESHOLD):
+        self.embeddings = embeddings
+        self.matrix = np.load(os.path.join(build_dir, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(build_dir, DOCS_FILE), "r") as f:
+            docs = json.load(f)
+        self.texts = docs["texts"]
+        self.metadatas = docs["metadatas"]
+        if len(self.matrix) != len(self.texts):
+            raise ValueError(f"Matrix index {build_dir} has {len(self.matrix)} vectors for {len(self.texts)} documents.")
+        self.ann = None
+        if hnswlib is None and len(self.matrix) > ann_threshold:
+            print(f"Matrix index has {len(self.matrix)} rows but hnswlib is not installed; "
+                  f"searches stay exact and slow down linearly. Install hnswlib to enable ANN.", file=sys.stderr)
+        elif len(self.matrix) > ann_threshold:
+            ann_path = os.path.join(build_dir, ANN_FILE)
+            with file_lock(ann_path):
+                if os.path.exists(ann_path):
+                    self.ann = hnswlib.Index(space="ip", dim=self.matrix.shape[1])
+                    self.ann.load_index(ann_path, max_elements=len(self.matrix))
+                else:
+                    self.ann = build_ann(self.matrix, ann_path)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def scores(self, query_vector):
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query_vector
+        scores = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), SCORE_CHUNK):
+            block = self.matrix[start:start + SCORE_CHUNK].astype(np.float32)
+            scores[start:start + SCORE_CHUNK] = block @ query_vector
+        return scores
+
+    def search_vector(self, query_vector, k=4):
+        k = min(k, len(self.matrix))
+        if k == 0:
+            return [], []
+        query_vector = normalize(query_vector)
+        if self.ann is not None:
+            self.ann.set_ef(max(50, k * 2))
+            labels, distances = self.ann.knn_query(query_vector, k=k)
+            return labels[0].tolist(), (1.0 - distances[0]).tolist()
+        scores = self.scores(query_vector)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top.tolist(), scores[top].tolist()
+
+    def similarity_search_with_score(self, query, k=4):
+        ids, scores = self.search_vector(self.embeddings.embed_query(query), k)
+        return [(Document(page_content=self.texts[i], metadata=self.metadatas[i]), score)
+                for i, score in zip(ids, scores)]
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def as_retriever(self, search_kwargs=None):
+        return MatrixRetriever(index=self, k=(search_kwargs or {}).get("k", 4))
+
+class MatrixRetriever(BaseRetriever):
+    index: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return self.index.similarity_search(query, self.k)
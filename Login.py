@@ -13,9 +13,9 @@ def login_user(username, password):
     with open(USER_FILE, "r") as f:
         for line in f.readlines():
             parts = line.strip().split(",")
-            if len(parts) != 2:  # skip bad lines
+            if len(parts) < 2:  # skip bad lines
                 continue
-            user, pwd = parts
+            user, pwd = parts[:2]
             if user == username and pwd == hashed:
                 return True
     return False
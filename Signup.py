@@ -3,11 +3,18 @@ import hashlib
 import os
 
 USER_FILE = "users.txt"
+STOCK_DIR = "stock/"
+DEFAULT_BRANCH = "main"
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def signup_user(username, password):
+def list_branches():
+    if not os.path.exists(STOCK_DIR):
+        return [DEFAULT_BRANCH]
+    return sorted(name[:-4] for name in os.listdir(STOCK_DIR) if name.endswith(".csv")) or [DEFAULT_BRANCH]
+
+def signup_user(username, password, branch=DEFAULT_BRANCH):
     if not os.path.exists(USER_FILE):
         with open(USER_FILE, "w") as f:
             pass
@@ -16,7 +23,7 @@ def signup_user(username, password):
     if username in users:
         return False, "Username already exists."
     with open(USER_FILE, "a") as f:
-        f.write(f"{username},{hash_password(password)}\n")
+        f.write(f"{username},{hash_password(password)},{branch}\n")
     return True, "Signup successful! Please login."
 
 st.set_page_config(page_title="Signup", page_icon="📝")
@@ -25,9 +32,10 @@ st.title("📝 Signup")
 
 username = st.text_input("Choose a Username")
 password = st.text_input("Choose a Password", type="password")
+branch = st.selectbox("Branch", list_branches())
 
 if st.button("Signup"):
-    success, msg = signup_user(username, password)
+    success, msg = signup_user(username, password, branch)
     st.success(msg) if success else st.error(msg)
     if success:
         st.session_state.page = "login"
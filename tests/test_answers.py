@@ -0,0 +1,73 @@
+import os
+import sys
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AI_Prescription_Agent"))
+
+from inventory import Inventory
+from answers import AnswerTable, format_response_pointwise
+
+REPO = os.path.join(os.path.dirname(__file__), "..")
+
+def make_inventory(tmp_path):
+    stock_dir = str(tmp_path / "stock")
+    shutil.copytree(os.path.join(REPO, "stock"), stock_dir)
+    inventory = Inventory(os.path.join(REPO, "formulary.csv"), stock_dir)
+    inventory.create_branch("north")
+    inventory.update_stock("north", 2, 12)
+    return inventory
+
+# The per-query formulary scan AnswerTable replaced, kept verbatim as the reference behaviour
+def get_med_info(query, inventory, branch):
+    query_lower = query.lower()
+    for _, row in inventory.formulary.iterrows():
+        medicine_name = row['Medicine_Name'].lower()
+        use_case_words = [w.strip() for w in row['Use_Case'].lower().split(',')]
+        if medicine_name in query_lower or any(word in query_lower for word in use_case_words):
+            quantity = inventory.quantity(branch, row['Medicine_ID'])
+            stock_msg = "available" if quantity > 0 else "out of stock"
+            alternative = row['Alternative'] if stock_msg != "available" else None
+            dosage = row['Dosage_Instruction']
+            if "available" in query_lower or "stock" in query_lower:
+                return f"{row['Medicine_Name']} is {stock_msg} at the {branch} branch ({quantity} units)." + (f" Alternative: {alternative}." if alternative else "")
+            elif "dosage" in query_lower or "take" in query_lower or "how" in query_lower:
+                return f"Dosage for {row['Medicine_Name']}: {dosage}."
+            elif "alternative" in query_lower or "substitute" in query_lower:
+                return f"Alternative for {row['Medicine_Name']}: {alternative if alternative else 'No alternative needed, medicine is available.'}"
+            else:
+                return (
+                    f"{row['Medicine_Name']} {row['Strength']} is used for {row['Use_Case']}. "
+                    f"Stock: {stock_msg}. " +
+                    (f"Alternative: {alternative}. " if alternative else "") +
+                    f"Dosage: {dosage}. Please consult a doctor before use."
+                )
+    return None
+
+def test_answer_table_matches_formulary_scan(tmp_path):
+    inventory = make_inventory(tmp_path)
+    answers = AnswerTable(inventory)
+    queries = ["something for a headache", "what can I take for allergy", "unknown tonic", "How are you"]
+    for name in inventory.formulary["Medicine_Name"]:
+        queries += [f"Is {name} available?", f"{name} in stock", f"How should I take {name}",
+                    f"{name} dosage", f"substitute for {name}", f"alternative to {name}", f"tell me about {name}",
+                    name.upper()]
+
+    for branch in ["main", "north"]:
+        for query in queries:
+            expected = get_med_info(query, inventory, branch)
+            assert answers.lookup(query, branch) == (format_response_pointwise(expected) if expected else None), query
+
+def test_stock_change_rerenders_only_that_row_of_that_branch(tmp_path):
+    inventory = make_inventory(tmp_path)
+    answers = AnswerTable(inventory)
+    main_before = dict(answers.table("main"))
+    north_before = dict(answers.table("north"))
+
+    inventory.update_stock("main", 2, 7)
+    main_after = answers.table("main")
+    north_after = answers.table("north")
+
+    assert main_after[2] is not main_before[2]
+    assert "(7 units)" in main_after[2]["stock"]
+    assert all(main_after[med_id] is main_before[med_id] for med_id in main_before if med_id != 2)
+    assert all(north_after[med_id] is north_before[med_id] for med_id in north_before)
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AI_Prescription_Agent"))
+
+from audit import AuditLog, query_audit_log
+
+FLUSH_INTERVAL = 0.6
+
+def test_tight_range_finds_record_written_after_flush_interval(tmp_path):
+    log = AuditLog(str(tmp_path), flush_interval=FLUSH_INTERVAL)
+    recorded_at = time.time()
+    log.record("alice", "main", "is paracetamol available", "• yes\n", "catalog")
+
+    # The writer only opens the file once the partial batch times out, after the record's ts
+    time.sleep(FLUSH_INTERVAL + 0.3)
+    since, until = recorded_at - 1, recorded_at + 0.5
+    assert [e["q"] for e in query_audit_log(str(tmp_path), "alice", since, until)] == ["is paracetamol available"]
+
+    log.close()
+    assert [e["q"] for e in query_audit_log(str(tmp_path), "alice", since, until)] == ["is paracetamol available"]
+
+def test_rotated_files_are_pruned_by_record_span(tmp_path):
+    log = AuditLog(str(tmp_path), flush_interval=0.05, max_bytes=1)
+    log.record("alice", "main", "first", "a", "catalog")
+    log.flush()
+    time.sleep(0.05)
+    middle = time.time()
+    time.sleep(0.05)
+    log.record("alice", "main", "second", "a", "catalog")
+    log.close()
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert [e["q"] for e in query_audit_log(str(tmp_path), until=middle)] == ["first"]
+    assert [e["q"] for e in query_audit_log(str(tmp_path), since=middle)] == ["second"]
+
+def test_writer_survives_unserializable_record(tmp_path):
+    log = AuditLog(str(tmp_path), flush_interval=0.05)
+    log.record("alice", "main", "bad", object(), "catalog")
+    log.flush()
+    log.record("alice", "main", "good", "a", "catalog")
+    log.close()
+
+    assert [e["q"] for e in query_audit_log(str(tmp_path))] == ["bad", "good"]
+
+def test_bad_record_does_not_lose_the_rest_of_its_batch(tmp_path):
+    log = AuditLog(str(tmp_path), flush_interval=5)
+    for i in range(5):
+        log.record("alice", "main", f"good{i}", "a", "catalog")
+    circular = []
+    circular.append(circular)
+    log.record("alice", "main", "circular", circular, "catalog")
+    log.record("alice", "main", "object", object(), "catalog")
+    log.close()
+
+    assert [e["q"] for e in query_audit_log(str(tmp_path))] == [f"good{i}" for i in range(5)] + ["object"]
+
+def test_flush_returns_while_other_threads_keep_recording(tmp_path):
+    log = AuditLog(str(tmp_path), flush_interval=0.05)
+    stop = threading.Event()
+
+    def keep_recording(user):
+        while not stop.is_set():
+            log.record(user, "main", "q", "a", "catalog")
+
+    writers = [threading.Thread(target=keep_recording, args=(f"u{i}",)) for i in range(8)]
+    for writer in writers:
+        writer.start()
+    try:
+        log.record("alice", "main", "logout", "a", "catalog")
+        flusher = threading.Thread(target=log.flush)
+        flusher.start()
+        flusher.join(timeout=5)
+        assert not flusher.is_alive()
+        assert [e["q"] for e in query_audit_log(str(tmp_path), "alice")] == ["logout"]
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+        log.close()
@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AI_Prescription_Agent"))
+
+from inventory import Inventory, file_lock, stock_path, write_shard
+
+def make_inventory(tmp_path):
+    formulary = tmp_path / "formulary.csv"
+    formulary.write_text("Medicine_ID,Medicine_Name\n1,Paracetamol\n2,Ibuprofen\n")
+    stock_dir = str(tmp_path / "stock")
+    write_shard(stock_path("main", stock_dir), {1: 5, 2: 0})
+    write_shard(stock_path("north", stock_dir), {1: 1, 2: 1})
+    return Inventory(str(formulary), stock_dir)
+
+def test_reads_do_not_wait_on_an_update_blocked_by_another_process(tmp_path):
+    inventory = make_inventory(tmp_path)
+    inventory.shard("main")
+    updater = threading.Thread(target=inventory.update_stock, args=("north", 1, 9))
+
+    # Holding the file lock stands in for another process midway through writing north.csv
+    with file_lock(stock_path("north", inventory.stock_dir)):
+        updater.start()
+        updater.join(timeout=0.3)
+        assert updater.is_alive()
+        seen = []
+        reader = threading.Thread(target=lambda: seen.extend([inventory.quantity("main", 1),
+                                                              inventory.quantity("north", 1)]), daemon=True)
+        reader.start()
+        reader.join(timeout=2)
+        assert seen == [5, 1]
+    updater.join(timeout=5)
+
+    assert inventory.quantity("north", 1) == 9
+    assert inventory.quantity("main", 1) == 5
+
+def test_concurrent_updates_to_one_branch_are_all_kept(tmp_path):
+    inventory = make_inventory(tmp_path)
+    updaters = [threading.Thread(target=inventory.update_stock, args=("main", med_id, 20 + med_id))
+                for med_id in range(1, 21)]
+    for updater in updaters:
+        updater.start()
+    for updater in updaters:
+        updater.join()
+
+    assert Inventory(str(tmp_path / "formulary.csv"), inventory.stock_dir).shard("main") == \
+        {med_id: 20 + med_id for med_id in range(1, 21)}
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+from langchain_core.language_models import FakeListLLM
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AI_Prescription_Agent"))
+
+from llm_cache import SQLiteResponseCache, CacheMissError
+
+# The response list is part of FakeListLLM's llm_string, so every model shares it
+RESPONSES = ["first answer", "second answer", "third answer"]
+
+def make_llm(cache):
+    return FakeListLLM(responses=RESPONSES, cache=cache)
+
+def test_record_then_replay_hit(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    assert make_llm(SQLiteResponseCache(path, "record")).invoke("dose of paracetamol") == "first answer"
+
+    replay = SQLiteResponseCache(path, "replay")
+    assert make_llm(replay).invoke("dose of paracetamol") == "first answer"
+    assert len(replay) == 1
+
+def test_replay_miss_raises(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    make_llm(SQLiteResponseCache(path, "record")).invoke("dose of paracetamol")
+
+    with pytest.raises(CacheMissError):
+        make_llm(SQLiteResponseCache(path, "replay")).invoke("dose of ibuprofen")
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteResponseCache(path, "record", max_entries=2, touch_interval=0)
+    llm = make_llm(cache)
+    llm.invoke("a")
+    llm.invoke("b")
+    assert llm.invoke("a") == "first answer"  # hit: "a" becomes the most recently used
+    llm.invoke("c")
+
+    assert len(cache) == 2
+    replay = make_llm(SQLiteResponseCache(path, "replay"))
+    assert replay.invoke("a") == "first answer"
+    assert replay.invoke("c") == "third answer"
+    with pytest.raises(CacheMissError):
+        replay.invoke("b")
+
+def test_hits_within_touch_interval_do_not_write(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), "record", touch_interval=60)
+    llm = make_llm(cache)
+    llm.invoke("a")
+    before = cache._connect().total_changes
+    for _ in range(5):
+        llm.invoke("a")
+
+    assert cache._connect().total_changes == before
@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AI_Prescription_Agent"))
+
+import vector_index
+from vector_index import MatrixIndex, load_matrix_index, current_build, DOCS_FILE
+
+class LengthEmbeddings:
+    def embed_documents(self, texts):
+        return [[len(text), text.count("a"), 1.0] for text in texts]
+
+    def embed_query(self, query):
+        return [len(query), query.count("a"), 1.0]
+
+def test_rebuild_leaves_open_index_consistent(tmp_path):
+    texts, metadatas = ["aaa", "b", "ab"], [{"Medicine_ID": i} for i in range(3)]
+    live = load_matrix_index(texts, metadatas, LengthEmbeddings(), str(tmp_path))
+    before = live.similarity_search("aa", 3)
+
+    # A grown, renumbered catalog stored as float16 lands in a new build directory
+    rebuilt = load_matrix_index(texts + ["abab"], [{"Medicine_ID": i + 10} for i in range(4)],
+                                LengthEmbeddings(), str(tmp_path), "float16")
+
+    assert live.similarity_search("aa", 3) == before
+    assert len(rebuilt) == 4 and rebuilt.matrix.dtype == "float16"
+    assert current_build(str(tmp_path)) != os.path.dirname(live.matrix.filename)
+
+def test_open_rejects_mismatched_vectors_and_documents(tmp_path):
+    load_matrix_index(["aaa", "b"], [{}, {}], LengthEmbeddings(), str(tmp_path))
+    build_dir = current_build(str(tmp_path))
+    with open(os.path.join(build_dir, DOCS_FILE), "r") as f:
+        docs = json.load(f)
+    docs["texts"], docs["metadatas"] = docs["texts"][:1], docs["metadatas"][:1]
+    with open(os.path.join(build_dir, DOCS_FILE), "w") as f:
+        json.dump(docs, f)
+
+    with pytest.raises(ValueError):
+        MatrixIndex(build_dir, LengthEmbeddings())
+
+def test_warns_when_catalog_needs_ann_but_hnswlib_is_missing(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(vector_index, "hnswlib", None)
+    load_matrix_index(["aaa", "b", "ab"], [{}, {}, {}], LengthEmbeddings(), str(tmp_path))
+    assert "hnswlib" not in capsys.readouterr().err
+
+    index = MatrixIndex(current_build(str(tmp_path)), LengthEmbeddings(), ann_threshold=2)
+    assert "hnswlib is not installed" in capsys.readouterr().err
+    assert index.ann is None and len(index.similarity_search("aa", 2)) == 2